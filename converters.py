@@ -1,6 +1,6 @@
 import re
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
+import functools
+from datetime import datetime, timedelta
 from abc import ABC
 from typing import Generic, TypeVar
 import sys
@@ -8,10 +8,80 @@ import sys
 # FIXME: 12 -> 12:01 not 12:00
 TIME_RE = re.compile(r"^(?P<hour>\d\d??)\s*:?\s*(?P<minute>\d\d?)?\s*(?P<p>pm?|am?)?$", re.IGNORECASE)
 DURATION_RE = re.compile(r"^(?:(?P<hours>\d+(?:\.\d+)?)?\s*[h:]\s*)?(?P<minutes>\d+)?m?$", re.IGNORECASE)
+# strftime flag for "no zero padding" is %#I on windows and %-I elsewhere
+_DASH = "#" if sys.platform == "win32" else "-"
+HALF_DAY = timedelta(hours=12)
+ONE_DAY = timedelta(days=1)
 
 T = TypeVar('T')
 
+
+# the same few datetimes get formatted over and over (every label of a bulk update, every entry refresh)
+@functools.lru_cache(maxsize=256)
+def strftime(d: datetime, fmt: str) -> str:
+    return d.strftime(fmt)
+
+
+def _split_time(string: str) -> tuple[str, str | None, str | None] | None:
+    # fast path for TIME_RE on the common shapes ("1", "130", "1:30", "1:30 pm"), giving the same groups.
+    # returns None when unsure, and the caller falls back to the regex
+    p = None
+    last = string[-1]
+    if last == 'm' or last == 'M':
+        if len(string) < 2 or string[-2] not in "aApP":
+            return None
+        p = string[-2:]
+        string = string[:-2].rstrip()
+    elif last in "aApP":
+        p = last
+        string = string[:-1].rstrip()
+    hour, colon, minute = string.partition(':')
+    if colon:
+        hour = hour.rstrip()
+        minute = minute.lstrip()
+        if not (0 < len(hour) <= 2 and hour.isdecimal()):
+            return None
+        if not minute:
+            return hour, None, p
+        if len(minute) <= 2 and minute.isdecimal():
+            return hour, minute, p
+        return None
+    if not hour.isdecimal():
+        return None
+    # without a colon the regex takes the shortest hour that leaves a valid minute
+    n = len(hour)
+    if n == 1:
+        return hour, None, p
+    if n == 2 or n == 3:
+        return hour[0], hour[1:], p
+    if n == 4:
+        return hour[:2], hour[2:], p
+    return None
+
+
+def _split_duration(string: str) -> tuple[str | None, str | None] | None:
+    # fast path for DURATION_RE on the common shapes ("30", "30m", "2h", "1.5h", "1:30", "1h30m"), giving the same groups.
+    # returns None when unsure, and the caller falls back to the regex
+    minutes = string[:-1] if string[-1] in "mM" else string
+    hours = None
+    for sep in ":hH":
+        head, found, tail = minutes.partition(sep)
+        if found:
+            hours = head.rstrip()
+            minutes = tail.lstrip()
+            break
+    if hours:
+        whole, dot, fraction = hours.partition('.')
+        if not whole.isdecimal() or (dot and not fraction.isdecimal()):
+            return None
+    if minutes and not minutes.isdecimal():
+        return None
+    return hours or None, minutes or None
+
+
 class Converter(ABC, Generic[T]):
+    __slots__ = ('error',)
+
     def __init__(self):
         self.error = None
     
@@ -23,6 +93,8 @@ class Converter(ABC, Generic[T]):
 
 
 class StringConverter(Converter):
+    __slots__ = ()
+
     def to_string(self, value: str | None) -> str:
         if value is None:
             return ""
@@ -33,76 +105,87 @@ class StringConverter(Converter):
 
 
 class TimeToNextDatetimeConverter(Converter):
+    __slots__ = ('format',)
+    _now = datetime.now
+    _match = TIME_RE.match
+
     def __init__(self, datetime_format: str):
         super().__init__()
-        if sys.platform != "win32":
-            datetime_format = datetime_format.replace("#", "-")
-        self.format = datetime_format
+        self.format = datetime_format.replace("#", _DASH)
 
     def to_string(self, value: datetime | None) -> str:
         if value is None:
             return ""
-        return datetime.strftime(value, self.format)
+        return strftime(value, self.format)
 
     def to_value(self, string: str) -> datetime | None:
         if not string:
             self.error = ""
             return None
-        self.error = None
-        if match := TIME_RE.match(string):
-            groups = match.groupdict()
-            hour = int(groups["hour"])
+        # truncate to the minute so the same input keeps hitting the cache while typing
+        value, self.error = self._parse(string, self._now().replace(second=0, microsecond=0))
+        return value
+
+    @classmethod
+    @functools.lru_cache(maxsize=128)
+    def _parse(cls, string: str, now: datetime) -> tuple[datetime | None, str | None]:
+        parts = _split_time(string)
+        if parts is None and (match := cls._match(string)):
+            parts = match.group(1, 2, 3)
+        if parts is not None:
+            str_hour, str_minute, p = parts
+            hour = int(str_hour)
             if hour < 1 or hour > 12:
-                self.error = "Hour must be 1-12"
-                return None
-            minute = int(groups["minute"] or 0)
+                return None, "Hour must be 1-12"
+            minute = int(str_minute or 0)
             if minute < 0 or minute > 59:
-                self.error = "Minute must be 0-59"
-                return None
-            now = datetime.now()
+                return None, "Minute must be 0-59"
             # assume time given is AM and adjust from there
-            new_time = now.replace(hour=hour % 12, minute=minute, second=0, microsecond=0)
-            p = groups["p"]
+            new_time = now.replace(hour=hour % 12, minute=minute)
+            # now has no seconds, so a time in the current minute counts as already passed
             if p is None:
-                for _ in range(2):
-                    if new_time < now:
-                        new_time += relativedelta(hours=12)
+                if new_time <= now:
+                    new_time += HALF_DAY
+                    if new_time <= now:
+                        new_time += HALF_DAY
             else:
-                if p.lower().startswith('p'):
-                    new_time += relativedelta(hours=12)
-                if new_time < now:
-                    new_time += relativedelta(days=1)
-            return new_time
-        self.error = "Could not parse as time"
-        return None
+                if p[0] == 'p' or p[0] == 'P':
+                    new_time += HALF_DAY
+                if new_time <= now:
+                    new_time += ONE_DAY
+            return new_time, None
+        return None, "Could not parse as time"
 
 
 class DurationConverter(Converter):
+    __slots__ = ('format',)
+    _match = DURATION_RE.match
+
     def __init__(self, time_format: str):
         super().__init__()
         self.format = time_format
 
-    def to_string(self, value: relativedelta | None) -> str:
+    def to_string(self, value: timedelta | None) -> str:
         if value is None:
             return ""
-        return self.format.format(h=value.hours, m=value.minutes)
+        h, m = divmod(value.total_seconds() // 60, 60)
+        return self.format.format(h=int(h), m=int(m))
 
-    def to_value(self, string: str) -> relativedelta | None:
+    def to_value(self, string: str) -> timedelta | None:
         if not string:
             self.error = ""
             return None
         self.error = None
-        if match := DURATION_RE.match(string):
-            groups = match.groupdict()
-            hours = 0.0
-            mins = 0
-            if str_hours := groups.get("hours"):
-                hours = float(str_hours)
-            if str_mins := groups.get("minutes"):
-                mins = int(str_mins)
+        parts = _split_duration(string)
+        if parts is None and (match := self._match(string)):
+            parts = match.group(1, 2)
+        if parts is not None:
+            str_hours, str_mins = parts
+            hours = float(str_hours) if str_hours else 0.0
+            mins = int(str_mins) if str_mins else 0
             total_mins = round(hours * 60 + mins)
             if total_mins < 0:
                 self.error = "Duration must be positive"
-            return relativedelta(minutes=total_mins)
+            return timedelta(minutes=total_mins)
         self.error = "Could not parse as duration"
         return None
@@ -1,91 +1,225 @@
 import tkinter as tk
 from tkinter import ttk
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
+from datetime import datetime, timedelta
 
 import masterref
 import widgets as w
 import converters as conv
 import pickle
+import json
+import io
+import hashlib
 import os
+import functools
+import logging
+import sys
+
+
+CLOCK_FMT = "%#I:%M" if sys.platform == "win32" else "%-I:%M"  # 1:30
+TIME_FMT = CLOCK_FMT + " %p"  # 1:30 PM
+DAY_TIME_FMT = "%a, " + TIME_FMT  # Sun, 1:30 PM
+
+logger = logging.getLogger(__name__)
+
+
+def _count_trailing_empty(items: list['Step | Product']) -> int:
+    count = 0
+    for item in reversed(items):
+        if item.name:
+            break
+        count += 1
+    return count
+
+
+def _update_trailing_empty(items: list['Step | Product'], count: int, row: int, named: bool) -> int:
+    # new number of unnamed items at the end of the list, after the item at row was named or had its name cleared
+    n = len(items)
+    if named:
+        if row >= n - count:
+            # named a trailing blank, only the blanks after it are still trailing
+            return n - 1 - row
+    elif row == n - count - 1:
+        # cleared the last named item, it joins the trailing blanks along with any blanks before it
+        count += 1
+        while count < n and not items[n - count - 1].name:
+            count += 1
+    return count
+
+
+def _datetime_to_json(d: datetime | None) -> str | None:
+    return None if d is None else d.isoformat()
+
+
+def _datetime_from_json(s: str | None) -> datetime | None:
+    return None if s is None else datetime.fromisoformat(s)
+
+
+# stand-in for the dateutil relativedelta that legacy pickles stored step durations as, so they load without dateutil
+class _LegacyRelativedelta:
+    def to_timedelta(self) -> timedelta:
+        # durations were only ever built from hours and minutes, so there are no years or months to lose
+        return timedelta(days=getattr(self, "days", 0), hours=getattr(self, "hours", 0),
+                         minutes=getattr(self, "minutes", 0), seconds=getattr(self, "seconds", 0),
+                         microseconds=getattr(self, "microseconds", 0))
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    def find_class(self, module: str, name: str):
+        if (module, name) == ("dateutil.relativedelta", "relativedelta"):
+            return _LegacyRelativedelta
+        if module == "__main__" and name in ("State", "Product", "Step"):
+            # pickled while gui.py was running as a script
+            return globals()[name]
+        return super().find_class(module, name)
+
+
+def _set_legacy_state(obj: 'State | Product | Step', state: dict):
+    # legacy pickles were written before __slots__, as an attribute dict
+    for k, v in state.items():
+        if isinstance(v, _LegacyRelativedelta):
+            v = v.to_timedelta()
+        setattr(obj, k, v)
 
 
 class Step:
-    def __init__(self, name: str | None, time_delta: relativedelta | None):
+    __slots__ = ('name', 'time_delta')
+    
+    def __init__(self, name: str | None, time_delta: timedelta | None):
         self.name = name
         self.time_delta = time_delta
+    
+    __setstate__ = _set_legacy_state
+    
+    # steps and products are stored positionally, so the field names aren't repeated for every element
+    def to_json(self) -> list:
+        return [self.name, None if self.time_delta is None else self.time_delta.total_seconds()]
+    
+    @staticmethod
+    def from_json(data: list) -> 'Step':
+        name, seconds = data
+        return Step(name, None if seconds is None else timedelta(seconds=seconds))
 
 
 class Product:
+    __slots__ = ('id', 'name', 'done_datetime', 'timeline')
+    
     def __init__(self, pid: int | None, name: str | None, done_datetime: datetime | None):
         self.id = pid
         self.name = name
         self.done_datetime = done_datetime
         self.timeline: list[Step] = []
+    
+    __setstate__ = _set_legacy_state
+    
+    def to_json(self) -> list:
+        return [self.id, self.name, _datetime_to_json(self.done_datetime), [step.to_json() for step in self.timeline]]
+    
+    @staticmethod
+    def from_json(data: list) -> 'Product':
+        pid, name, done_datetime, timeline = data
+        product = Product(pid, name, _datetime_from_json(done_datetime))
+        product.timeline = [Step.from_json(step) for step in timeline]
+        return product
 
 
 class State:
-    perist_file = "state.pickle"
+    __slots__ = ('all_done_datetime', 'products', 'next_product_id', '_last_saved')
+    perist_file = "state.pickle"  # name kept from when the state was pickled, so existing files get migrated
     
     def __init__(self):
         self.all_done_datetime: datetime | None = None
         self.products: list[Product] = []
         self.next_product_id = 1
+        self._last_saved: tuple[str, bytes] | None = None  # (file, digest) of the last write
+    
+    def __setstate__(self, state: dict):
+        self._last_saved = None
+        _set_legacy_state(self, state)
+    
+    def to_json(self) -> dict:
+        return {
+            "all_done_datetime": _datetime_to_json(self.all_done_datetime),
+            "products": [product.to_json() for product in self.products],
+            "next_product_id": self.next_product_id,
+        }
+    
+    @staticmethod
+    def from_json(data: dict) -> 'State':
+        state = State()
+        state.all_done_datetime = _datetime_from_json(data["all_done_datetime"])
+        state.products = [Product.from_json(product) for product in data["products"]]
+        state.next_product_id = data["next_product_id"]
+        return state
     
     def save(self, file=None):
         file = file or State.perist_file
         backup_file = "." + file
+        data = json.dumps(self.to_json(), separators=(",", ":")).encode()
+        saved = (file, hashlib.blake2b(data, digest_size=16).digest())
+        if saved == self._last_saved:
+            return  # nothing changed since the last save
         
-        # 3-stage commit:
-        # 1. write to backup
-        # 2. write to main file
-        # 3. remove backup
+        # 2-stage commit:
+        # 1. write to backup and flush it to disk
+        # 2. atomically replace main file with backup
         # -----
         # if crash before step 1: nothing is written, [old state] is preserved in main file
         # if crash during step 1: backup is corrupted, [old state] is preserved in main file
         # if crash between step 1 and 2: [new state] is preserved in backup, old state is preserved in main file
-        # if crash during step 2: main file is corrupted, [new state] is preserved in backup
-        # if crash between step 2 and 3: [new state] is preserved in both the backup and main file
-        # if crash during step 3: backup is corrupted, [new state] is preserved in main file
-        # if crash after step 3: backup is deleted, [new state] is preserved in main file
+        # if crash during step 2: the replace is atomic, so this is the same as crashing just before or after it
+        # if crash after step 2: backup is gone, [new state] is preserved in main file
         # -----
         with open(backup_file, 'wb') as f:
-            pickle.dump(self, f)
-        with open(file, 'wb') as f:
-            pickle.dump(self, f)
-        os.remove(backup_file)
-        # print("Saved successfully to " + file)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(backup_file, file)
+        self._last_saved = saved
+        logger.debug("Saved successfully to %s", file)
+    
+    @staticmethod
+    def _read(file) -> 'State':
+        with open(file, 'rb') as f:
+            data = f.read()
+        if data[:1] == b"\x80":
+            # pickle from before the state was stored as json, it is rewritten as json on the next save
+            return _LegacyUnpickler(io.BytesIO(data)).load()
+        return State.from_json(json.loads(data))
     
     @staticmethod
     def load(file=None):
         file = file or State.perist_file
         backup_file = "." + file
+        corrupted = (EOFError, ValueError, TypeError, KeyError, pickle.UnpicklingError)
         
         # because of the way the file is saved, checking for the backup first produces a more recent copy
         if os.path.exists(backup_file):
-            with open(backup_file, 'rb') as f:
-                try:
-                    return pickle.load(f)
-                except (EOFError, ValueError, TypeError):
-                    print("New state file was corrupted. Loading from previous state.")
+            try:
+                return State._read(backup_file)
+            except corrupted:
+                logger.warning("New state file was corrupted. Loading from previous state.")
         if os.path.exists(file):
-            with open(file, 'rb') as f:
-                try:
-                    return pickle.load(f)
-                except (EOFError, ValueError, TypeError):
-                    print("State file was corrupted. This should never happen.")
-        print("State files are missing or corrupted.")  # bad!
+            try:
+                return State._read(file)
+            except corrupted:
+                logger.error("State file was corrupted. This should never happen.")
+        logger.warning("State files are missing or corrupted.")  # bad!
         return State()
 
 
 class App(ttk.Frame):
+    persist_delay_ms = 250  # edits closer together than this are saved together
+    
     def __init__(self, state: State, **kwargs):
         super().__init__(**kwargs)
         self.state: State = state
         self.init = True  # Do not persist anything until the state is fully loaded
+        self._persist_after_id = None
+        self._suppress_persist = False
+        self.winfo_toplevel().protocol("WM_DELETE_WINDOW", self.on_close)
         
         self.all_done_stack = w.HStack(self)
-        self.all_done_entry = w.Entry(self.all_done_stack, conv.TimeToNextDatetimeConverter("%#I:%M %p"), width=10)  # 1:30 PM
+        self.all_done_entry = w.Entry(self.all_done_stack, conv.TimeToNextDatetimeConverter(TIME_FMT), width=10)  # 1:30 PM
         self.all_done_entry.set(self.state.all_done_datetime)
         self.all_done_entry.listen(self.on_all_done_changed)
         self.all_done_display_label = w.Label(self.all_done_stack)
@@ -103,20 +237,34 @@ class App(ttk.Frame):
             self.recalculate_timeline(product)
     
     def persist(self):
-        if self.init:
+        if self.init or self._suppress_persist:
             return
+        # coalesce bursts of edits (i.e. typing) into a single save
+        if self._persist_after_id:
+            self.after_cancel(self._persist_after_id)
+        self._persist_after_id = self.after(self.persist_delay_ms, self._do_persist)
+    
+    def _do_persist(self):
+        self._persist_after_id = None
         self.state.save()
     
+    def on_close(self):
+        # flush a save that is still waiting on the debounce
+        if self._persist_after_id:
+            self.after_cancel(self._persist_after_id)
+            self._do_persist()
+        self.winfo_toplevel().destroy()
+    
     def recalculate_timeline(self, product: Product):
         if product.done_datetime is None or product.name is None or product.timeline is None:
             return
-        print(f"{product.name} done: {product.done_datetime:%#I:%M}")
+        print(f"{product.name} done: {product.done_datetime:{CLOCK_FMT}}")
         time = product.done_datetime
         for step in reversed(product.timeline):
             if step.name is None or step.time_delta is None:
                 continue
             time -= step.time_delta
-            print(f"{step.name}: {time:%#I:%M}")
+            print(f"{step.name}: {time:{CLOCK_FMT}}")
         print("---------------------")
     
     def on_all_done_changed(self, d: datetime | None, error: str | None):
@@ -125,15 +273,21 @@ class App(ttk.Frame):
             self.all_done_display_label.set(error or "")
         else:
             self.all_done_entry.config(foreground='black')
-            self.all_done_display_label.set(d.strftime("%a, %#I:%M %p"))  # Sun, 1:30 PM
+            self.all_done_display_label.set(conv.strftime(d, DAY_TIME_FMT))  # Sun, 1:30 PM
         
         # update all times of products to the new default if they matched the previous default value
+        old_d = self.state.all_done_datetime
+        get_widget = self.product_list.get_widget
+        self._suppress_persist = True  # saved once below instead of once per updated product
         for row, product in enumerate(self.state.products):
             if not product.name:
                 continue
             dt = product.done_datetime
-            if dt is None or dt == self.state.all_done_datetime:
-                self.product_list.get_widget(row, "time").set(d)
+            if dt is None or dt == old_d:
+                entry = get_widget(row, "time")
+                if entry.get() != d:
+                    entry.set(d)
+        self._suppress_persist = False
                 
         self.state.all_done_datetime = d
         self.persist()
@@ -145,10 +299,13 @@ class ProductList(w.Table):
         self.app = app
         self.state = app.state
         self.init = True
+        self.trailing_empty_count = 0  # number of unnamed products at the end of the list, kept up to date by on_name_change
         
-        for product in self.state.products:
-            self.render_product(product)
-            self.render_timeline(product)
+        with self.batch():
+            for product in self.state.products:
+                self.render_product(product)
+                self.render_timeline(product)
+        self.trailing_empty_count = _count_trailing_empty(self.state.products)
             
         self.init = False
         self.ensure_one_blank()
@@ -156,21 +313,15 @@ class ProductList(w.Table):
     def ensure_one_blank(self):
         if self.init:
             return
-        empty = 0
-        last_index = len(self.state.products) - 1
-        for i in range(last_index, -1, -1):
-            product = self.state.products[i]
-            if product.name:
-                break
-            else:
-                empty += 1
+        empty = self.trailing_empty_count
         if empty == 0:
             self.add_phantom_product()
-        else:
+        elif empty > 1:
+            last_index = len(self.state.products) - 1
             for j in range(last_index, last_index - empty + 1, -1):
-                self.delete_row(j)
-                self.app.product_list.delete_row(j)
+                self.recycle_row(j)
                 del self.state.products[j]
+            self.trailing_empty_count = 1
 
     def add_phantom_product(self):
         product = Product(None, None, None)
@@ -181,42 +332,51 @@ class ProductList(w.Table):
         self.app.timeline_stack.add(StepList(self.app.timeline_stack, self.app, product))
     
     def render_product(self, product: Product):
-        product_entry = w.Entry(self, width=20)
-        time_entry = w.Entry(self, conv.TimeToNextDatetimeConverter("%#I:%M %p"), width=10)  # 1:30 PM
-        display_label = w.Label(self)
+        if self.spare_rows:
+            product_entry, time_entry, display_label = self.spare_rows.pop()
+        else:
+            product_entry = w.Entry(self, width=20)
+            time_entry = w.Entry(self, conv.TimeToNextDatetimeConverter(TIME_FMT), width=10)  # 1:30 PM
+            display_label = w.Label(self)
         row = self.add(product=product_entry, time=time_entry, display=display_label)
-    
-        def on_name_change(s: str, _err):
-            product.name = s
-
-            if product.id is None:
-                product.id = self.state.next_product_id
-                self.state.next_product_id += 1
-                self.state.products.append(product)
-                self.render_timeline(product)
-            
-            if s and product.done_datetime is None:
-                self.get_widget(row, "time").set(self.state.all_done_datetime)
         
-            self.ensure_one_blank()
-            self.app.persist()
+        product_entry.listen(functools.partial(self.on_name_change, product, row))
+        time_entry.listen(functools.partial(self.on_done_changed, product, product_entry, display_label))
+        product_entry.set(product.name)
+        time_entry.set(product.done_datetime)
     
-        def on_done_changed(d: datetime | None, error: str | None):
-            product.done_datetime = d
-            
-            if d is None:
-                product_entry.config(foreground='red')
-                display_label.set(error or "")
-            else:
-                product_entry.config(foreground='black')
-                display_label.set(d.strftime("%a, %#I:%M %p"))  # Sun, 1:30 PM
+    def on_name_change(self, product: Product, row: int, s: str, _err):
+        was_empty = not product.name
+        product.name = s
+        
+        if product.id is None:
+            product.id = self.state.next_product_id
+            self.state.next_product_id += 1
+            self.state.products.append(product)
+            self.render_timeline(product)
+            self.trailing_empty_count = 0 if s else self.trailing_empty_count + 1
+        elif was_empty != (not s):
+            self.trailing_empty_count = _update_trailing_empty(self.state.products, self.trailing_empty_count, row, bool(s))
+        
+        if s and product.done_datetime is None:
+            self.get_widget(row, "time").set(self.state.all_done_datetime)
         
-            self.app.persist()
+        self.ensure_one_blank()
+        self.app.persist()
     
-        product_entry.listen(on_name_change)
-        time_entry.listen(on_done_changed)
-        product_entry.set(product.name)
-        time_entry.set(product.done_datetime)
+    def on_done_changed(self, product: Product, product_entry: w.Entry, display_label: w.Label,
+                        d: datetime | None, error: str | None):
+        product.done_datetime = d
+        
+        if d is None:
+            product_entry.config(foreground='red')
+            display_label.set(error or "")
+        else:
+            product_entry.config(foreground='black')
+            display_label.set(conv.strftime(d, DAY_TIME_FMT))  # Sun, 1:30 PM
+        
+        self.app.persist()
+
 
 class StepList(w.Table):
     def __init__(self, master, app: App, product: Product, **kwargs):
@@ -226,8 +386,10 @@ class StepList(w.Table):
         self.product = product
         self.init = True
         
-        for step in product.timeline:
-            self.render_step(step)
+        with self.batch():
+            for step in product.timeline:
+                self.render_step(step)
+        self.trailing_empty_count = _count_trailing_empty(product.timeline)  # kept up to date by on_name_change
             
         self.init = False
         self.ensure_one_blank()
@@ -235,61 +397,66 @@ class StepList(w.Table):
     def ensure_one_blank(self):
         if self.init:
             return
-        empty = 0
-        last_index = len(self.product.timeline) - 1
-        for i in range(last_index, -1, -1):
-            step = self.product.timeline[i]
-            if step.name:
-                break
-            else:
-                empty += 1
+        empty = self.trailing_empty_count
         if empty == 0:
             self.add_phantom_step()
-        else:
+        elif empty > 1:
+            last_index = len(self.product.timeline) - 1
             for j in range(last_index, last_index - empty + 1, -1):
-                self.delete_row(j)
+                self.recycle_row(j)
                 del self.product.timeline[j]
+            self.trailing_empty_count = 1
     
     def add_phantom_step(self):
         step = Step(None, None)
         self.product.timeline.append(step)
+        self.trailing_empty_count += 1
         self.render_step(step)
     
     def render_step(self, step: Step):
-        step_entry = w.Entry(self, width=20)
-        time_entry = w.Entry(self, conv.DurationConverter("{h}h {m}m"), width=10)  # 1:30 PM
-        display_label = w.Label(self)
-        self.add(step=step_entry, time=time_entry, display=display_label)
+        if self.spare_rows:
+            step_entry, time_entry, display_label = self.spare_rows.pop()
+        else:
+            step_entry = w.Entry(self, width=20)
+            time_entry = w.Entry(self, conv.DurationConverter("{h}h {m}m"), width=10)  # 1:30 PM
+            display_label = w.Label(self)
+        row = self.add(step=step_entry, time=time_entry, display=display_label)
         
-        def on_name_change(s: str, _err):
-            step.name = s
-            
-            self.ensure_one_blank()
-            self.app.persist()
+        step_entry.listen(functools.partial(self.on_name_change, step, row))
+        time_entry.listen(functools.partial(self.on_time_changed, step, step_entry, display_label))
+        step_entry.set(step.name)
+        time_entry.set(step.time_delta)
+    
+    def on_name_change(self, step: Step, row: int, s: str, _err):
+        was_empty = not step.name
+        step.name = s
+        if not self.init and was_empty != (not s):
+            self.trailing_empty_count = _update_trailing_empty(self.product.timeline, self.trailing_empty_count, row, bool(s))
         
-        def on_time_changed(dt: relativedelta | None, error: str | None):
-            step.time_delta = dt
-            
-            if dt is None:
-                step_entry.config(foreground='red')
-                display_label.set(error or "")
+        self.ensure_one_blank()
+        self.app.persist()
+    
+    def on_time_changed(self, step: Step, step_entry: w.Entry, display_label: w.Label,
+                        dt: timedelta | None, error: str | None):
+        step.time_delta = dt
+        
+        if dt is None:
+            step_entry.config(foreground='red')
+            display_label.set(error or "")
+        else:
+            step_entry.config(foreground='black')
+            hours, minutes = divmod(dt.seconds // 60, 60)
+            if dt.days > 0:
+                display_label.set(f"{dt.days}:{hours:02d}:{minutes:02d}")  # 1:02:30
             else:
-                step_entry.config(foreground='black')
-                if dt.days > 0:
-                    display_label.set(f"{dt.days}:{dt.hours:02d}:{dt.minutes:02d}")  # 1:02:30
-                else:
-                    display_label.set(f"{dt.hours}:{dt.minutes:02d}")  # 0:07
-            
-            self.app.recalculate_timeline(self.product)
-            self.app.persist()
+                display_label.set(f"{hours}:{minutes:02d}")  # 0:07
         
-        step_entry.listen(on_name_change)
-        time_entry.listen(on_time_changed)
-        step_entry.set(step.name)
-        time_entry.set(step.time_delta)
+        self.app.recalculate_timeline(self.product)
+        self.app.persist()
 
 
 def main():
+    logging.basicConfig(level=logging.WARNING)
     app = App(State.load())
     app.grid(sticky=tk.NSEW, padx=10, pady=10)
     masterref.root.mainloop()
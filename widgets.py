@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk
 from typing import Callable
+from contextlib import contextmanager
 import converters as conv
 from typing import Generic, TypeVar
 
@@ -46,23 +47,53 @@ ColumnKey = int|str
 class Table(BaseFrame):
     def __init__(self, master, key_order: list[str] = None, fixed=False, padx=5, pady=5, **kwargs):
         super().__init__(master, **kwargs)
-        self.widgets: list[dict[ColumnKey, ttk.Widget]] = []
+        # one list per column index, each holding that column's widget (or None) for every row
+        self._cols: dict[int, list[ttk.Widget | None]] = {}
+        self.row_count = 0
         self.key_order: list[str] = key_order or []
+        self._col_index = {k: i for i, k in enumerate(self.key_order)}
         self.fixed = fixed
         self.padx = padx
         self.pady = pady
+        self._deferred: list[tuple[ttk.Widget, dict]] | None = None
+        self.spare_rows: list[list[ttk.Widget | None]] = []  # widgets of recycled rows, in column order
+    
+    # widgets added inside the block are gridded when it exits, with size propagation held off until then,
+    # so a bulk load is laid out in one go
+    @contextmanager
+    def batch(self):
+        self._deferred = []
+        self.grid_propagate(False)
+        try:
+            yield self
+        finally:
+            deferred, self._deferred = self._deferred, None
+            for widget, kwargs in deferred:
+                widget.grid(**kwargs)
+            self.grid_propagate(True)
+    
+    def _grid(self, widget: ttk.Widget, **kwargs):
+        if self._deferred is None:
+            widget.grid(**kwargs)
+        else:
+            self._deferred.append((widget, kwargs))
     
     def get_column(self, key: ColumnKey):
         if isinstance(key, int):
             return key
-        return self.key_order.index(key)
+        return self._col_index[key]
+    
+    def _column(self, column: int) -> list[ttk.Widget | None]:
+        if (col := self._cols.get(column)) is None:
+            col = self._cols[column] = [None] * self.row_count
+        return col
     
     def row_exists(self, row: int):
-        return -len(self.widgets) <= row < len(self.widgets)
+        return -self.row_count <= row < self.row_count
 
     def get_widget(self, row: int, key: ColumnKey):
-        if self.row_exists(row):
-            return self.widgets[row].get(key)
+        if self.row_exists(row) and (col := self._cols.get(self.get_column(key))) is not None:
+            return col[row]
         return None
     
     def set_widget(self, row: int, key: ColumnKey, widget: SupportsWidget):
@@ -70,8 +101,9 @@ class Table(BaseFrame):
             return False
         widget = self.as_widget(widget)
         self.remove(row, key)  # remove destination just in case
-        widget.grid(row=row, column=self.get_column(key), padx=self.padx, pady=self.pady)
-        self.widgets[row][key] = widget
+        column = self.get_column(key)
+        self._grid(widget, row=row, column=column, padx=self.padx, pady=self.pady)
+        self._column(column)[row] = widget
     
     @staticmethod
     def _iter(*i, **k):
@@ -89,30 +121,45 @@ class Table(BaseFrame):
                 self.grid_columnconfigure(c, weight=width)
     
     def add(self, *iwidgets: SupportsWidget, **kwidgets: SupportsWidget) -> int:
-        row = {}
-        next_row = len(self.widgets)
+        next_row = self.row_count
+        for col in self._cols.values():
+            col.append(None)
+        self.row_count += 1
         for k, widget in self._iter(*iwidgets, **kwidgets):
             widget = self.as_widget(widget)
-            widget.grid(row=next_row, column=self.get_column(k), padx=self.padx, pady=self.pady, sticky=tk.W)
-            row[k] = widget
-        self.widgets.append(row)
+            column = self.get_column(k)
+            self._grid(widget, row=next_row, column=column, padx=self.padx, pady=self.pady, sticky=tk.W)
+            self._column(column)[next_row] = widget
         return next_row
     
     def delete_row(self, row: int):
-        for k in self.key_order:
-            self.remove(row, k)
-        # the last remove() call deletes the widget row, it says we have one less row than is displayed
-        # shift all rows below up one
-        for r in range(row + 1, len(self.widgets) + 1):
-            for k in self.key_order:
-                self.move(r, k, r - 1)
+        if not self.row_exists(row):
+            return
+        row %= self.row_count
+        self.row_count -= 1
+        for col in self._cols.values():
+            if widget := col.pop(row):
+                widget.grid_forget()
+            # shift all rows below up one, in place instead of removing and re-adding them
+            for r in range(row, self.row_count):
+                if widget := col[r]:
+                    widget.grid_configure(row=r)
+    
+    # like delete_row, but keeps the widgets in spare_rows so a row added later can reuse them instead of creating new ones
+    def recycle_row(self, row: int):
+        if not self.row_exists(row):
+            return
+        widgets = [self.get_widget(row, c) for c in range(len(self.key_order))]
+        for widget in widgets:
+            if isinstance(widget, Entry):
+                widget.unlisten()
+        self.delete_row(row)
+        self.spare_rows.append(widgets)
     
     def remove(self, row: int, key: ColumnKey):
         if w := self.get_widget(row, key):
             w.grid_remove()
-            del self.widgets[row][key]
-            if not self.widgets[row]:
-                del self.widgets[row]
+            self._cols[self.get_column(key)][row] = None
             return w
         return None
     
@@ -127,7 +174,7 @@ class Table(BaseFrame):
         self.set_widget(row, key, widget)
     
     def __iter__(self):
-        for r in range(len(self.widgets)):
+        for r in range(self.row_count):
             yield r
 
 
@@ -142,18 +189,58 @@ class Entry(ttk.Entry, Generic[T]):
         self.var = tk.StringVar()
         self.config(textvariable=self.var)
         self.converter = converter
+        self._traces: list[str] = []
+        # result of converting _last_str, so unchanged text isn't converted again
+        self._last_str: str | None = None
+        self._last_value: T | None = None
+        self._last_error: str | None = None
         
     def get(self) -> T | None:
-        return self.converter.to_value(self.var.get().strip())
+        s = self.var.get().strip()
+        if s != self._last_str:
+            self._last_value = self.converter.to_value(s)
+            self._last_error = self.converter.error
+            self._last_str = s
+        return self._last_value
     
     def set(self, value: T | None):
-        self.var.set(self.converter.to_string(value))
+        s = self.converter.to_string(value)
+        if value is not None:
+            # prime the cache before the write traces run, the same text can stand for a new value
+            # (e.g. the same clock time on the next day)
+            self._last_str, self._last_value, self._last_error = s.strip(), value, None
+        self.var.set(s)
 
     def listen(self, callback: Callable[[T, str | None], None]):
-        def wrapper(*_):
-            callback(self.get(), self.converter.error)
+        # only notify when the converted value or error actually changed, i.e. not for added whitespace.
+        # the wrappers run on every keystroke, so what they use is bound as defaults (fast locals)
+        last = None
+        
+        if type(self.converter) is conv.StringConverter:
+            # the value is just the stripped text and there is never an error, so skip the converter
+            def wrapper(*_, get=self.var.get, callback=callback):
+                nonlocal last
+                value = get().strip()
+                if value == last:
+                    return
+                last = value
+                callback(value, None)
+        else:
+            def wrapper(*_, get=self.get, callback=callback):
+                nonlocal last
+                value = get()
+                fired = (value, self._last_error)
+                if fired == last:
+                    return
+                last = fired
+                callback(*fired)
+    
+        self._traces.append(self.var.trace_add('write', wrapper))
     
-        self.var.trace_add('write', wrapper)
+    def unlisten(self):
+        for name in self._traces:
+            self.var.trace_remove('write', name)
+        self._traces.clear()
 
 
 class Label(ttk.Label):
@@ -166,5 +253,7 @@ class Label(ttk.Label):
         return self.var.get().strip()
 
     def set(self, value):
-        self.var.set(str(value).strip())
+        value = str(value).strip()
+        if value != self.var.get():  # skip the Tcl variable write when the text is unchanged
+            self.var.set(value)
 